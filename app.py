@@ -1,19 +1,25 @@
+import hashlib
 import json
 import os
+import queue
 import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import streamlit as st
 from dotenv import load_dotenv
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-import anthropic
 
 
 load_dotenv()
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+MODEL = "claude-opus-4-6"
+SHEETS_TIMEOUT_SECONDS = 10
 
 
 def require_env(name: str) -> str:
@@ -23,7 +29,16 @@ def require_env(name: str) -> str:
     return value
 
 
+@st.cache_resource(show_spinner=False)
 def sheets_client():
+    # Imported here so the first page render does not wait on the Google
+    # client libraries; they are only needed once the button is clicked.
+    import httplib2
+    from google.oauth2.service_account import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build
+    from googleapiclient.http import HttpRequest
+
     email = require_env("GOOGLE_SERVICE_ACCOUNT_EMAIL")
     private_key = require_env("GOOGLE_PRIVATE_KEY").replace("\\n", "\n")
     creds = Credentials.from_service_account_info(
@@ -35,59 +50,91 @@ def sheets_client():
         },
         scopes=SCOPES,
     )
-    return build("sheets", "v4", credentials=creds)
+    # The service is shared by every session and outlives each rerun's thread,
+    # but httplib2.Http is not thread-safe. Each request checks a keep-alive
+    # transport out of a shared pool for the length of execute() and returns
+    # it afterwards, so connections are reused across clicks while no two
+    # threads ever use the same one at once.
+    transports: "queue.LifoQueue[AuthorizedHttp]" = queue.LifoQueue()
+
+    class PooledRequest(HttpRequest):
+        def execute(self, http=None, num_retries=0):
+            if http is not None:
+                return super().execute(http=http, num_retries=num_retries)
+            try:
+                transport = transports.get_nowait()
+            except queue.Empty:
+                transport = AuthorizedHttp(creds, http=httplib2.Http(timeout=SHEETS_TIMEOUT_SECONDS))
+            try:
+                return super().execute(http=transport, num_retries=num_retries)
+            finally:
+                transports.put(transport)
+
+    # Static discovery reads the bundled v4 document instead of fetching it.
+    return build(
+        "sheets",
+        "v4",
+        credentials=creds,
+        requestBuilder=PooledRequest,
+        cache_discovery=False,
+        static_discovery=True,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _anthropic_client():
+    import anthropic
+
+    return anthropic.Anthropic(api_key=require_env("ANTHROPIC_API_KEY"))
 
 
 def _normalize_header_map(header: List[str]) -> Dict[str, int]:
     return {name.strip().lower(): i for i, name in enumerate(header)}
 
 
-def _cell(row: List[str], idx: Dict[str, int], key: str) -> str:
-    pos = idx.get(key)
-    if pos is None or len(row) <= pos:
-        return ""
-    return row[pos]
+def _columns(body: List[List[str]], idx: Dict[str, int], *keys: str) -> List[List[str]]:
+    # Transpose the ragged rows once, then strip whole columns, instead of
+    # looking up and bounds-checking every cell row by row.
+    cols = list(zip_longest(*body, fillvalue=""))
+    blank = [""] * len(body)
+    out = []
+    for key in keys:
+        pos = idx.get(key)
+        if pos is None or pos >= len(cols):
+            out.append(blank)
+        else:
+            out.append(list(map(str.strip, cols[pos])))
+    return out
 
 
-def _normalize_key(key: str) -> str:
-    cleaned = re.sub(r"[^a-z0-9]+", "_", (key or "").strip().lower())
-    return cleaned.strip("_")
+# Headers that identify the current sheet format:
+# Week | Date | Day Type | Exercise | Set | ... | Notes
+_MODERN_HEADERS = frozenset({"date", "day type", "exercise", "set"})
 
 
-def read_recent_workouts(
-    service, sheet_id: str, tab_name: str, limit: int = 10
+def _parse_workouts(
+    idx: Dict[str, int], body: List[List[str]], anchored: bool
 ) -> List[Dict[str, str]]:
-    range_name = f"{tab_name}!A:H"
-    resp = (
-        service.spreadsheets()
-        .values()
-        .get(spreadsheetId=sheet_id, range=range_name)
-        .execute()
-    )
-    rows = resp.get("values", [])
-    if not rows:
-        return []
-
-    header = rows[0]
-    body = rows[1:]
-    idx = _normalize_header_map(header)
     workouts = []
 
-    # Current live sheet format:
-    # Week | Date | Day Type | Exercise | Set | ... | Notes
-    if {"date", "day type", "exercise", "set"}.issubset(set(idx.keys())):
+    # Current live sheet format.
+    if _MODERN_HEADERS <= idx.keys():
         # Forward-fill these fields so sparse logging (blank repeated cells) still parses.
         ff = {"week": "", "date": "", "day_type": "", "exercise": ""}
-        for row in body:
-            raw_date = _cell(row, idx, "date").strip()
-            raw_day_type = _cell(row, idx, "day type").strip()
-            raw_exercise = _cell(row, idx, "exercise").strip()
-            set_num = _cell(row, idx, "set").strip()
-            raw_week = _cell(row, idx, "week").strip()
-            weight_lbs = _cell(row, idx, "weight (lbs)").strip()
-            reps = _cell(row, idx, "reps").strip()
-            sheet_notes = _cell(row, idx, "notes").strip()
-
+        has_week = "week" in idx
+        columns = _columns(
+            body, idx, "date", "day type", "exercise", "set", "week", "weight (lbs)", "reps", "notes"
+        )
+        for (
+            raw_date,
+            raw_day_type,
+            raw_exercise,
+            set_num,
+            raw_week,
+            weight_lbs,
+            reps,
+            sheet_notes,
+        ) in zip(*columns):
             if raw_week:
                 ff["week"] = raw_week
             if raw_date:
@@ -97,6 +144,16 @@ def read_recent_workouts(
             if raw_exercise:
                 ff["exercise"] = raw_exercise
 
+            # A tail read can start mid-day or mid-week. Skip rows until every
+            # forward-filled field has been seen inside the window; Week is
+            # usually only on a week's first row, so it may sit further back.
+            if not anchored:
+                if not (raw_date and raw_day_type and raw_exercise):
+                    continue
+                if has_week and not ff["week"]:
+                    continue
+                anchored = True
+
             week = ff["week"]
             date = ff["date"]
             day_type = ff["day_type"]
@@ -126,88 +183,209 @@ def read_recent_workouts(
     else:
         # Backward-compatible legacy format:
         # date | type | workout | notes | ai_output
-        for row in body:
-            row_type = _cell(row, idx, "type").strip()
+        columns = _columns(body, idx, "type", "date", "workout", "notes")
+        for row_type, date, workout, notes in zip(*columns):
             if row_type != "workout_log":
                 continue
-            workouts.append(
-                {
-                    "date": _cell(row, idx, "date").strip(),
-                    "workout": _cell(row, idx, "workout").strip(),
-                    "notes": _cell(row, idx, "notes").strip(),
-                }
+            workouts.append({"date": date, "workout": workout, "notes": notes})
+
+    return workouts
+
+
+@st.cache_resource(show_spinner=False)
+def _last_data_rows() -> Dict[Tuple[str, str], int]:
+    # Last sheet row holding data, per (sheet_id, tab_name), kept across
+    # reruns. Only a hint for where to start reading; the tail range is
+    # open-ended so new rows are always seen.
+    return {}
+
+
+def read_recent_workouts(
+    service, sheet_id: str, tab_name: str, limit: int = 10
+) -> List[Dict[str, str]]:
+    # Read only the tail of the log once its length is known, widening the
+    # window backwards until it holds enough workouts or reaches row 2. Rows
+    # before the window's first fully anchored row (see _parse_workouts) do
+    # not count, so the result always matches a full read.
+    last_rows = _last_data_rows()
+    key = (sheet_id, tab_name)
+    window = max(limit * 5, 50)
+    last_row = last_rows.get(key)
+    start = max(2, last_row - window + 1) if last_row else 2
+    resp = (
+        service.spreadsheets()
+        .values()
+        .batchGet(
+            spreadsheetId=sheet_id,
+            ranges=[f"{tab_name}!A1:H1", f"{tab_name}!A{start}:H"],
+            fields="valueRanges(values)",
+        )
+        .execute()
+    )
+    header_range, body_range = resp.get("valueRanges", [{}, {}])
+    header_rows = header_range.get("values", [])
+    if not header_rows:
+        return []
+
+    header = header_rows[0]
+    body = body_range.get("values", [])
+    if body:
+        last_rows[key] = start + len(body) - 1
+    else:
+        last_rows.pop(key, None)
+    idx = _normalize_header_map(header)
+
+    workouts = _parse_workouts(idx, body, anchored=start == 2)
+    while len(workouts) < limit and start > 2:
+        end = start - 1
+        window *= 2
+        # An empty tail means the hint is stale (rows were removed); go
+        # straight to the top rather than walking back window by window.
+        start = max(2, end - window + 1) if body else 2
+        resp = (
+            service.spreadsheets()
+            .values()
+            .get(
+                spreadsheetId=sheet_id,
+                range=f"{tab_name}!A{start}:H{end}",
+                fields="values",
             )
+            .execute()
+        )
+        body = resp.get("values", []) + body
+        workouts = _parse_workouts(idx, body, anchored=start == 2)
 
     return workouts[-limit:]
 
 
-def _parse_response_json(content: str) -> Dict[str, Any]:
-    text = (content or "{}").strip()
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        cleaned = text.replace("```json", "").replace("```", "").strip()
-        return json.loads(cleaned)
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_recent_workouts(sheet_id: str, tab_name: str, limit: int) -> List[Dict[str, str]]:
+    # The service comes from its own resource cache so it is not part of the key.
+    return read_recent_workouts(sheets_client(), sheet_id, tab_name, limit=limit)
+
 
+# Plan row fields in sheet column order (Week .. Notes): the short key the
+# model emits, the name used in the app, and the JSON schema requested.
+_PLAN_FIELDS = (
+    ("w", "week", {"type": "string"}),
+    ("d", "date", {"type": "string"}),
+    ("t", "day_type", {"type": "string"}),
+    ("e", "exercise", {"type": "string"}),
+    ("s", "set", {"type": "integer"}),
+    ("lb", "weight_lbs", {"anyOf": [{"type": "number"}, {"type": "null"}]}),
+    ("r", "reps", {"type": "string"}),
+    ("n", "notes", {"type": "string"}),
+)
 
 _WORKOUT_PLAN_SCHEMA = {
     "type": "object",
     "properties": {
         "tips": {"type": "string"},
-        "workout_plan": {
+        "plan": {
             "type": "array",
             "items": {
                 "type": "object",
-                "properties": {
-                    "week": {"type": "string"},
-                    "date": {"type": "string"},
-                    "day_type": {"type": "string"},
-                    "exercise": {"type": "string"},
-                    "set": {"type": "string"},
-                    "weight_lbs": {"type": "string"},
-                    "reps": {"type": "string"},
-                    "notes": {"type": "string"},
-                },
-                "required": ["week", "date", "day_type", "exercise", "set", "weight_lbs", "reps", "notes"],
+                "properties": {short: schema for short, _, schema in _PLAN_FIELDS},
+                "required": [short for short, _, _ in _PLAN_FIELDS],
                 "additionalProperties": False,
             },
         },
     },
-    "required": ["tips", "workout_plan"],
+    "required": ["tips", "plan"],
     "additionalProperties": False,
 }
 
 
-def generate_advice_and_next_workout(workouts: List[Dict[str, str]]) -> Dict[str, Any]:
-    client = anthropic.Anthropic(api_key=require_env("ANTHROPIC_API_KEY"))
+# Everything that does not depend on the workouts lives here, so the prompt
+# prefix stays byte-identical between calls and can be served from cache.
+_SYSTEM_PROMPT = (
+    "You are a practical fitness coach with the demeanor of a gruff high school football coach. "
+    "Respond only with valid JSON matching the provided schema.\n"
+    "Analyze the user's recent workouts and produce a personalized tips string and a next workout plan.\n"
+    "Each plan row uses short keys: w=week, d=date (YYYY-MM-DD), t=day type, e=exercise, "
+    "s=set number, lb=weight in lbs (null for bodyweight or unweighted), r=reps, n=notes."
+)
+
+
+def _plan_value(value: Any) -> str:
+    # null (no weight) stays a blank cell, as in hand-logged rows.
+    if value is None:
+        return ""
+    # Whole-number floats come back as e.g. 135.0; the sheet wants "135".
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+_TIPS_PREFIX_RE = re.compile(r'"tips"\s*:\s*"')
 
-    prompt = (
-        "Analyze these recent workouts and produce a personalized tips string and a next workout plan.\n"
-        "Use date format YYYY-MM-DD. Keep all values as strings.\n"
-        f"Recent workouts: {json.dumps(workouts)}"
-    )
+
+def _partial_tips(buffer: str) -> str:
+    # Best-effort decode of the "tips" string from a JSON response that is
+    # still streaming; the value may be cut off mid-escape.
+    match = _TIPS_PREFIX_RE.search(buffer)
+    if not match:
+        return ""
+    raw = '"' + buffer[match.end():]
+    try:
+        return json.JSONDecoder().raw_decode(raw)[0]
+    except json.JSONDecodeError:
+        pass
+    for cut in range(len(raw), max(len(raw) - 6, 0), -1):
+        try:
+            return json.loads(raw[:cut] + '"')
+        except json.JSONDecodeError:
+            continue
+    return ""
+
+
+def _request_advice(
+    workouts_json: str,
+    model: str,
+    on_tips: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    client = _anthropic_client()
 
     with client.messages.stream(
-        model="claude-opus-4-6",
+        model=model,
         max_tokens=16000,
         thinking={"type": "adaptive"},
-        system=(
-            "You are a practical fitness coach with the demeanor of a gruff high school football coach. "
-            "Respond only with valid JSON matching the provided schema."
-        ),
-        messages=[{"role": "user", "content": prompt}],
+        system=[
+            {
+                "type": "text",
+                "text": _SYSTEM_PROMPT,
+                "cache_control": {"type": "ephemeral"},
+            }
+        ],
+        messages=[
+            {
+                "role": "user",
+                "content": f"Recent workouts: {workouts_json}",
+            }
+        ],
         output_config={"format": {"type": "json_schema", "name": "workout_response", "schema": _WORKOUT_PLAN_SCHEMA}},
     ) as stream:
+        if on_tips is not None:
+            # "tips" is the first schema property, so it can be shown while the
+            # rest of the plan is still being generated.
+            buffer = ""
+            shown = ""
+            for delta in stream.text_stream:
+                buffer += delta
+                tips = _partial_tips(buffer)
+                if tips != shown:
+                    on_tips(tips)
+                    shown = tips
         response = stream.get_final_message()
 
     text = next(b.text for b in response.content if b.type == "text")
     parsed = json.loads(text)
 
     normalized_rows: List[Dict[str, str]] = []
-    for row in parsed.get("workout_plan", []):
+    for row in parsed.get("plan", []):
         if not isinstance(row, dict):
             continue
-        nrow = {_normalize_key(k): str(v).strip() for k, v in row.items()}
+        nrow = {name: _plan_value(row.get(short, "")) for short, name, _ in _PLAN_FIELDS}
         if not nrow.get("day_type") or not nrow.get("exercise"):
             continue
         normalized_rows.append(nrow)
@@ -218,16 +396,107 @@ def generate_advice_and_next_workout(workouts: List[Dict[str, str]]) -> Dict[str
     }
 
 
-def _parse_updated_range_rows(updated_range: str) -> Tuple[int, int]:
-    # Example: "'workout table'!A333:H340"
-    _, cells = updated_range.split("!", 1)
-    start_ref, end_ref = cells.split(":", 1)
-    start_row = int(re.search(r"\d+", start_ref).group(0))
-    end_row = int(re.search(r"\d+", end_ref).group(0))
-    return start_row, end_row
+def _dump_workouts(workouts: List[Dict[str, str]]) -> str:
+    # Sorted keys keep equal inputs byte-identical for the cache key and the
+    # prompt; compact separators drop the whitespace tokens from the prompt.
+    return json.dumps(workouts, sort_keys=True, separators=(",", ":"))
 
 
-def _get_sheet_gid(service, sheet_id: str, tab_name: str) -> int:
+# Model responses are cached in two tiers, both keyed by (workouts hash,
+# model) with a one-hour TTL. L1 is a plain dict rather than st.cache_data, so
+# a miss can stream into the page. L2 is a SQLite file that survives restarts
+# and redeploys.
+_ADVICE_TTL_SECONDS = 3600
+_ADVICE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".workout_cache.sqlite3")
+
+
+def _advice_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(_ADVICE_DB_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS advice (key TEXT PRIMARY KEY, stored_at REAL, value TEXT)"
+    )
+    return conn
+
+
+def _load_persisted_advice(key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+    # Returns (stored_at, advice) so the caller can age the L1 copy to match.
+    try:
+        with closing(_advice_db()) as conn:
+            row = conn.execute(
+                "SELECT stored_at, value FROM advice WHERE key = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error:
+        # The disk tier is best-effort; an unwritable directory is just a miss.
+        return None
+    if row is None:
+        return None
+    try:
+        stored_at = float(row[0])
+        ai = json.loads(row[1])
+    except (TypeError, ValueError):
+        # A corrupt row is treated like any other disk-tier failure.
+        return None
+    if time.time() - stored_at >= _ADVICE_TTL_SECONDS:
+        return None
+    return stored_at, ai
+
+
+def _persist_advice(key: str, ai: Dict[str, Any]) -> None:
+    now = time.time()
+    try:
+        with closing(_advice_db()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO advice VALUES (?, ?, ?)", (key, now, json.dumps(ai))
+            )
+            conn.execute("DELETE FROM advice WHERE stored_at < ?", (now - _ADVICE_TTL_SECONDS,))
+    except sqlite3.Error:
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def _advice_cache() -> Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]]:
+    # L1 entries are (monotonic insert time, advice); served from a resource
+    # cache so they outlive the script run, unlike a module-level dict.
+    return {}
+
+
+def generate_advice_and_next_workout(
+    workouts: List[Dict[str, str]],
+    on_tips: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    workouts_json = _dump_workouts(workouts)
+    key = (hashlib.blake2b(workouts_json.encode()).hexdigest(), MODEL)
+    disk_key = f"{MODEL}:{key[0]}"
+    cache = _advice_cache()
+    now = time.monotonic()
+    hit = cache.get(key)
+    if hit is not None and now - hit[0] < _ADVICE_TTL_SECONDS:
+        return hit[1]
+    # The cache is shared with other sessions' threads; sweep over a snapshot
+    # and tolerate entries that another thread removed first.
+    expired = [k for k, (at, _) in list(cache.items()) if now - at >= _ADVICE_TTL_SECONDS]
+    for stale in expired:
+        cache.pop(stale, None)
+    persisted = _load_persisted_advice(disk_key)
+    if persisted is not None:
+        # Carry the entry's age over so it expires from L1 when it would on disk.
+        stored_at, ai = persisted
+        cache[key] = (now - (time.time() - stored_at), ai)
+        return ai
+    ai = _request_advice(workouts_json, MODEL, on_tips=on_tips)
+    _persist_advice(disk_key, ai)
+    cache[key] = (now, ai)
+    return ai
+
+
+@st.cache_resource(show_spinner=False)
+def _sheet_gids() -> Dict[Tuple[str, str], int]:
+    # Streamlit re-executes this script as a fresh module on every rerun, so
+    # state meant to outlive a click has to come from a resource cache.
+    return {}
+
+
+def _fetch_sheet_gid(service, sheet_id: str, tab_name: str) -> int:
     meta = (
         service.spreadsheets()
         .get(
@@ -243,40 +512,41 @@ def _get_sheet_gid(service, sheet_id: str, tab_name: str) -> int:
     raise ValueError(f"Could not find tab: {tab_name}")
 
 
-def _color_appended_rows(
-    service, sheet_id: str, tab_name: str, start_row: int, end_row: int
-) -> None:
-    gid = _get_sheet_gid(service, sheet_id, tab_name)
-    service.spreadsheets().batchUpdate(
-        spreadsheetId=sheet_id,
-        body={
-            "requests": [
-                {
-                    "repeatCell": {
-                        "range": {
-                            "sheetId": gid,
-                            "startRowIndex": start_row - 1,
-                            "endRowIndex": end_row,
-                            "startColumnIndex": 0,
-                            "endColumnIndex": 8,
-                        },
-                        "cell": {
-                            "userEnteredFormat": {
-                                "textFormat": {
-                                    "foregroundColor": {
-                                        "red": 0.12,
-                                        "green": 0.47,
-                                        "blue": 0.71,
-                                    }
-                                }
-                            }
-                        },
-                        "fields": "userEnteredFormat.textFormat.foregroundColor",
-                    }
-                }
+def _get_sheet_gid(service, sheet_id: str, tab_name: str) -> int:
+    # The gid of a tab never changes, so look it up once per process.
+    gids = _sheet_gids()
+    key = (sheet_id, tab_name)
+    if key not in gids:
+        gids[key] = _fetch_sheet_gid(service, sheet_id, tab_name)
+    return gids[key]
+
+
+# Text color for rows written by the app, so AI plans stand out in the sheet.
+_AI_ROW_COLOR = {"red": 0.12, "green": 0.47, "blue": 0.71}
+
+
+def _build_append_cells_request(
+    gid: int, values: List[List[str]], fg_color: Dict[str, float]
+) -> Dict[str, Any]:
+    # appendCells carries values and formatting together, so one batchUpdate
+    # both writes and colors the rows after the last row with data.
+    cell_format = {"textFormat": {"foregroundColor": fg_color}}
+    rows = [
+        {
+            "values": [
+                {"userEnteredValue": {"stringValue": value}, "userEnteredFormat": cell_format}
+                for value in row
             ]
-        },
-    ).execute()
+        }
+        for row in values
+    ]
+    return {
+        "appendCells": {
+            "sheetId": gid,
+            "rows": rows,
+            "fields": "userEnteredValue,userEnteredFormat.textFormat.foregroundColor",
+        }
+    }
 
 
 def append_ai_output(
@@ -287,41 +557,31 @@ def append_ai_output(
     workout_plan: List[Dict[str, str]],
 ):
     today = datetime.now().strftime("%Y-%m-%d")
-    values: List[List[str]] = []
-    for row in workout_plan:
-        values.append(
-            [
-                row.get("week", ""),
-                row.get("date", today),
-                row.get("day_type", ""),
-                row.get("exercise", ""),
-                row.get("set", ""),
-                row.get("weight_lbs", ""),
-                row.get("reps", ""),
-                row.get("notes", ""),
-            ]
-        )
+    values: List[List[str]] = [
+        [
+            row.get("week", ""),
+            row.get("date", today),
+            row.get("day_type", ""),
+            row.get("exercise", ""),
+            row.get("set", ""),
+            row.get("weight_lbs", ""),
+            row.get("reps", ""),
+            row.get("notes", ""),
+        ]
+        for row in workout_plan
+    ]
 
     if not values:
         # Fallback keeps behavior deterministic even if model returns no rows.
         values = [["", today, "AI Plan", "No plan rows returned", "", "", "", tips]]
 
-    append_result = (
-        service.spreadsheets()
-        .values()
-        .append(
-            spreadsheetId=sheet_id,
-            range=f"{tab_name}!A:H",
-            valueInputOption="RAW",
-            insertDataOption="INSERT_ROWS",
-            body={"values": values},
-        )
-        .execute()
-    )
-    updated_range = append_result.get("updates", {}).get("updatedRange", "")
-    if updated_range:
-        start_row, end_row = _parse_updated_range_rows(updated_range)
-        _color_appended_rows(service, sheet_id, tab_name, start_row, end_row)
+    gid = _get_sheet_gid(service, sheet_id, tab_name)
+    request = _build_append_cells_request(gid, values, _AI_ROW_COLOR)
+    service.spreadsheets().batchUpdate(
+        spreadsheetId=sheet_id,
+        fields="spreadsheetId",
+        body={"requests": [request]},
+    ).execute()
 
 
 st.set_page_config(page_title="Workout Helper", page_icon="💪")
@@ -344,11 +604,29 @@ if st.button("Analyze recent workouts and write next plan"):
         sheet_id = require_env("GOOGLE_SHEETS_ID")
         tab_name = os.getenv("SHEET_TAB", "Workouts")
         service = sheets_client()
-        workouts = read_recent_workouts(service, sheet_id, tab_name, limit=10)
+        workouts = _cached_recent_workouts(sheet_id, tab_name, limit=10)
         if not workouts:
+            # Don't hold on to an empty read: the user is expected to log rows
+            # in Sheets and click again right away.
+            _cached_recent_workouts.clear()
             st.warning("No workout_log rows found yet.")
         else:
-            ai = generate_advice_and_next_workout(workouts)
+            status = st.empty()
+            st.subheader("Tips")
+            tips_placeholder = st.empty()
+            gids = _sheet_gids()
+            gid_key = (sheet_id, tab_name)
+            if gid_key in gids:
+                ai = generate_advice_and_next_workout(workouts, on_tips=tips_placeholder.write)
+            else:
+                # The gid lookup is independent of the model call, so the first
+                # click for a tab resolves it in the background. Generation stays
+                # on the script thread so tips can stream.
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    gid_future = pool.submit(_fetch_sheet_gid, service, sheet_id, tab_name)
+                    ai = generate_advice_and_next_workout(workouts, on_tips=tips_placeholder.write)
+                    gids[gid_key] = gid_future.result()
+            tips_placeholder.write(ai["tips"])
             append_ai_output(
                 service,
                 sheet_id,
@@ -356,9 +634,9 @@ if st.button("Analyze recent workouts and write next plan"):
                 tips=ai["tips"],
                 workout_plan=ai["workout_plan"],
             )
-            st.success("Saved AI tips + inline workout plan to Google Sheets.")
-            st.subheader("Tips")
-            st.write(ai["tips"])
+            # The sheet just changed; the next click must not reuse the old read.
+            _cached_recent_workouts.clear()
+            status.success("Saved AI tips + inline workout plan to Google Sheets.")
             st.subheader("Planned Rows")
             if ai["workout_plan"]:
                 st.dataframe(ai["workout_plan"], use_container_width=True)